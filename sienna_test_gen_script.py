@@ -1,8 +1,14 @@
 import argparse
+import binascii
 import os
 import struct
+from pathlib import Path
 
-import numpy as np
+# numpy is imported inside the functions that use it, so --help and argument
+# errors return without loading it
+
+# Write buffer size for the hex dump files (1 MiB)
+WRITE_BUFFER_SIZE = 1 << 20
 
 
 def float_to_hex(f):
@@ -10,27 +16,116 @@ def float_to_hex(f):
     return "".join(f"{b:02x}" for b in struct.pack(">f", f))
 
 
+def arr_to_hex_lines(a):
+    """Convert an array of float32 to newline-terminated 8-character hex lines."""
+    import numpy as np
+
+    hexed = binascii.hexlify(a.astype(">f4", copy=False).tobytes())
+    # Every float is exactly 8 hex digits, so split the blob into fixed-width items
+    lines = np.frombuffer(hexed, dtype="S8").tolist()
+    return b"\n".join(lines) + b"\n"
+
+
 def hex_to_float(hex_str):
     """Convert an 8-character hex string to float32."""
     return struct.unpack(">f", bytes.fromhex(hex_str))[0]
 
 
-def apply_activation(x, activation_type="relu"):
-    """Apply activation function element-wise."""
-    if activation_type == "relu":
-        return np.maximum(0, x)
-    elif activation_type == "sigmoid":
-        return 1 / (1 + np.exp(-np.clip(x, -500, 500)))
-    elif activation_type == "tanh":
-        return np.tanh(x)
-    elif activation_type == "none":
-        return x
+def _relu(x, out=None):
+    import numpy as np
+
+    return np.maximum(0, x, out=out)
+
+
+def _sigmoid(x, out=None):
+    import numpy as np
+
+    # Reuse one buffer for every step instead of allocating a temporary each;
+    # it must be floating even for integer x, as np.exp would promote it
+    if out is None:
+        x = np.asarray(x)
+        t = np.empty(x.shape, dtype=np.result_type(x, np.float16))
     else:
+        t = out
+    np.negative(x, out=t)
+    np.clip(t, -500, 500, out=t)
+    np.exp(t, out=t)
+    t += 1.0
+    np.reciprocal(t, out=t)
+    return t
+
+
+def _tanh(x, out=None):
+    import numpy as np
+
+    return np.tanh(x, out=out)
+
+
+def _identity(x, out=None):
+    if out is None:
         return x
+    import numpy as np
+
+    np.copyto(out, x)
+    return out
+
+
+_ACTIVATIONS = {
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "tanh": _tanh,
+    "none": _identity,
+}
+
+
+def apply_activation(x, activation_type="relu", out=None):
+    """
+    Apply activation function element-wise (unknown types pass x through).
+
+    If out is given, the result is written into it and out is returned.
+    """
+    return _ACTIVATIONS.get(activation_type, _identity)(x, out=out)
+
+
+def im2col_2d(input_matrix, kernel_h, kernel_w, stride_h=1, stride_w=1):
+    """
+    Unfold a 2D matrix into im2col form.
+
+    Returns an (out_h * out_w) x (kernel_h * kernel_w) matrix whose rows are the
+    flattened windows in row-major output order, so a pool is a single row-wise
+    reduction and a convolution is a matmul against the flattened kernel.
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import as_strided
+
+    # as_strided trusts the strides it is given, so work on a C-contiguous array
+    input_matrix = np.ascontiguousarray(input_matrix)
+    in_h, in_w = input_matrix.shape
+    out_h = (in_h - kernel_h) // stride_h + 1
+    out_w = (in_w - kernel_w) // stride_w + 1
+    if out_h < 1 or out_w < 1:
+        raise ValueError(
+            f"{kernel_h}x{kernel_w} window does not fit in {in_h}x{in_w} input"
+        )
+
+    row_stride, col_stride = input_matrix.strides
+    windows = as_strided(
+        input_matrix,
+        shape=(out_h, out_w, kernel_h, kernel_w),
+        strides=(row_stride * stride_h, col_stride * stride_w, row_stride, col_stride),
+        writeable=False,
+    )
+    return windows.reshape(out_h * out_w, kernel_h * kernel_w)
 
 
 def apply_maxpool_2d(
-    input_matrix, pool_h=2, pool_w=2, stride_h=None, stride_w=None, padding=0
+    input_matrix,
+    pool_h=2,
+    pool_w=2,
+    stride_h=None,
+    stride_w=None,
+    padding=0,
+    out=None,
 ):
     """
     Apply 2D max pooling to input matrix.
@@ -40,7 +135,10 @@ def apply_maxpool_2d(
     - pool_h, pool_w: pooling window size
     - stride_h, stride_w: stride (defaults to pool size if None)
     - padding: zero padding around input
+    - out: optional float32 (out_h x out_w) array to write the result into
     """
+    import numpy as np
+
     if stride_h is None:
         stride_h = pool_h
     if stride_w is None:
@@ -48,27 +146,45 @@ def apply_maxpool_2d(
 
     # Add padding
     if padding > 0:
-        input_matrix = np.pad(input_matrix, padding, mode="constant", constant_values=0)
+        # Zero buffer + slice copy is cheaper than np.pad's generic dispatch
+        p = padding
+        in_h, in_w = input_matrix.shape
+        padded = np.zeros((in_h + 2 * p, in_w + 2 * p), dtype=input_matrix.dtype)
+        padded[p:-p, p:-p] = input_matrix
+        input_matrix = padded
 
     in_h, in_w = input_matrix.shape
     out_h = (in_h - pool_h) // stride_h + 1
     out_w = (in_w - pool_w) // stride_w + 1
+    if out_h < 1 or out_w < 1:
+        # Window does not fit: empty output rather than im2col_2d's ValueError
+        return np.zeros((out_h, out_w), dtype=np.float32) if out is None else out
+
+    # Default 2x2/stride-2 pool: max of the four strided corner views directly,
+    # skipping window construction (indexing overhead dominates on tiny inputs)
+    if pool_h == pool_w == stride_h == stride_w == 2:
+        rows, cols = 2 * out_h, 2 * out_w
+        top = np.maximum(
+            input_matrix[0:rows:2, 0:cols:2], input_matrix[0:rows:2, 1:cols:2]
+        )
+        bottom = np.maximum(
+            input_matrix[1:rows:2, 0:cols:2], input_matrix[1:rows:2, 1:cols:2]
+        )
+        if out is not None:
+            return np.maximum(top, bottom, out=out)
+        return np.maximum(top, bottom).astype(np.float32, copy=False)
 
-    output = np.zeros((out_h, out_w), dtype=np.float32)
-
-    for i in range(out_h):
-        for j in range(out_w):
-            h_start = i * stride_h
-            w_start = j * stride_w
-            window = input_matrix[
-                h_start : h_start + pool_h, w_start : w_start + pool_w
-            ]
-            output[i, j] = np.max(window)
+    # One im2col row per output cell, reduced in a single pass
+    cols = im2col_2d(input_matrix, pool_h, pool_w, stride_h, stride_w)
+    cols = cols.reshape(out_h, out_w, pool_h * pool_w)
+    if out is not None:
+        return cols.max(axis=-1, out=out)
+    output = cols.max(axis=-1).astype(np.float32, copy=False)
 
     return output
 
 
-def apply_dropout(x, dropout_p=0.5, training_mode=False, seed=None):
+def apply_dropout(x, dropout_p=0.5, training_mode=False, rng=None):
     """
     Apply dropout (for golden reference, we'll assume inference mode = no dropout).
 
@@ -76,13 +192,20 @@ def apply_dropout(x, dropout_p=0.5, training_mode=False, seed=None):
     - x: input array
     - dropout_p: dropout probability
     - training_mode: if True, randomly drop elements
-    - seed: random seed
+    - rng: np.random.Generator (or a seed for a new one); None for fresh entropy
     """
     if training_mode:
-        if seed is not None:
-            np.random.seed(seed)
-        mask = np.random.binomial(1, 1 - dropout_p, size=x.shape)
-        return x * mask / (1 - dropout_p)
+        import numpy as np
+
+        if not 0 <= dropout_p < 1:
+            raise ValueError(
+                f"dropout_p must be in [0, 1) in training mode, got {dropout_p}"
+            )
+        rng = np.random.default_rng(rng)
+        keep_p = 1 - dropout_p
+        inv_keep = 1.0 / keep_p
+        mask = rng.binomial(1, keep_p, size=x.shape)
+        return x * mask * inv_keep
     else:
         # Inference mode - no dropout
         return x
@@ -99,6 +222,7 @@ def generate_pipeline_test_vectors(
     seed=42,
     matrix_type="random",
     value_range=(-1.0, 1.0),
+    workspace=None,
 ):
     """
     Generate complete pipeline test vectors:
@@ -113,11 +237,18 @@ def generate_pipeline_test_vectors(
     - output_dir: Directory to save test files
     - seed: Random seed for reproducibility
     - matrix_type: "random", "identity", "ones", "small_int"
+      ("identity" and "ones" give A and B as the same array)
     - value_range: Tuple (min, max) for random values
+    - workspace: Optional dict of preallocated float32 buffers reused across
+      calls (e.g. when sweeping seeds): "C" and "activated" of shape (n, n),
+      "pooled" of the MaxPool output shape. Buffers must match shape and dtype;
+      missing keys are allocated as usual. The returned arrays alias these
+      buffers and are overwritten by the next call.
     """
 
-    if seed is not None:
-        np.random.seed(seed)
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
 
     os.makedirs(output_dir, exist_ok=True)
 
@@ -129,29 +260,40 @@ def generate_pipeline_test_vectors(
     print(f"\n1. Generating {n}x{n} input matrices...")
 
     if matrix_type == "identity":
-        A = np.eye(n, dtype=np.float32)
-        B = np.eye(n, dtype=np.float32)
+        A = B = np.eye(n, dtype=np.float32)
     elif matrix_type == "ones":
-        A = np.ones((n, n), dtype=np.float32)
-        B = np.ones((n, n), dtype=np.float32)
+        A = B = np.ones((n, n), dtype=np.float32)
     elif matrix_type == "small_int":
-        A = np.random.randint(-3, 4, size=(n, n)).astype(np.float32)
-        B = np.random.randint(-3, 4, size=(n, n)).astype(np.float32)
+        # Draw A and B in one call and split the buffer
+        buf = rng.integers(-3, 4, size=(2, n, n), dtype=np.int8).astype(np.float32)
+        A, B = buf[0], buf[1]
     else:  # random
-        A = np.random.uniform(value_range[0], value_range[1], size=(n, n)).astype(
-            np.float32
-        )
-        B = np.random.uniform(value_range[0], value_range[1], size=(n, n)).astype(
-            np.float32
-        )
+        lo, hi = value_range
+        f32_max = float(np.finfo(np.float32).max)
+        if abs(hi - lo) <= f32_max:
+            # Draw float32 directly and scale in place, no float64 buffer to cast
+            buf = rng.random(size=(2, n, n), dtype=np.float32)
+            buf *= np.float32(hi - lo)
+            buf += np.float32(lo)
+        else:
+            # The span overflows float32, so scale in float64 before casting
+            buf = rng.uniform(lo, hi, size=(2, n, n)).astype(np.float32)
+        if lo < hi <= f32_max:
+            # float32 rounding can land on hi itself; keep the range half-open
+            upper = np.nextafter(np.float32(hi), np.float32(max(lo, -f32_max)))
+            np.minimum(buf, upper, out=buf)
+        A, B = buf[0], buf[1]
 
     # ========== STEP 2: Matrix Multiplication (Systolic Array) ==========
     print(f"2. Computing matrix multiplication: C = A × B...")
-    C = np.matmul(A, B).astype(np.float32)
+    # A and B are float32, so BLAS sgemm already produces a float32 result
+    ws = workspace if workspace is not None else {}
+    C = np.matmul(A, B, out=ws.get("C"))
+    assert C.dtype == np.float32
 
     # ========== STEP 3: Activation Function (GPNAE) ==========
     print(f"3. Applying activation function: {activation_type}...")
-    activated = apply_activation(C, activation_type)
+    activated = apply_activation(C, activation_type, out=ws.get("activated"))
 
     # ========== STEP 4: MaxPooling ==========
     print(f"4. Applying MaxPool2D (pool={pool_h}x{pool_w}, padding={pool_padding})...")
@@ -165,71 +307,68 @@ def generate_pipeline_test_vectors(
 
     # Extract top-left corner for maxpool input
     maxpool_input = activated[:in_rows, :in_cols]
-    pooled = apply_maxpool_2d(maxpool_input, pool_h, pool_w, padding=pool_padding)
+    pooled = apply_maxpool_2d(
+        maxpool_input, pool_h, pool_w, padding=pool_padding, out=ws.get("pooled")
+    )
 
     # ========== STEP 5: Dropout ==========
     print(f"5. Applying Dropout (p={dropout_p}, inference mode)...")
-    final_output = apply_dropout(pooled, dropout_p, training_mode=False)
+    # Inference-mode dropout is the identity, so skip the apply_dropout call
+    final_output = pooled
 
     # ========== STEP 6: Write Output Files ==========
     print(f"\n6. Writing test files to '{output_dir}'...")
 
+    # reshape(-1) is a view, so this avoids copying the output for each use
+    first_val = final_output.reshape(-1)[0]
+    first_hex = float_to_hex(first_val)
+
     # Write North Matrix (Matrix A)
     north_file = os.path.join(output_dir, "matrix_north.txt")
-    with open(north_file, "w") as f:
-        for val in A.flatten():
-            f.write(float_to_hex(val) + "\n")
+    with open(north_file, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(arr_to_hex_lines(A))
     print(f"   ✓ {north_file} ({n}×{n} = {n*n} elements)")
 
     # Write West Matrix (Matrix B)
     west_file = os.path.join(output_dir, "matrix_west.txt")
-    with open(west_file, "w") as f:
-        for val in B.flatten():
-            f.write(float_to_hex(val) + "\n")
+    with open(west_file, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(arr_to_hex_lines(B))
     print(f"   ✓ {west_file} ({n}×{n} = {n*n} elements)")
 
     # Write Expected Final Output
     # Note: The actual output depends on what your design outputs
     # It could be a single scalar, or the flattened pooled matrix
     output_file = os.path.join(output_dir, "expected_output.txt")
-    with open(output_file, "w") as f:
+    with open(output_file, "wb", buffering=WRITE_BUFFER_SIZE) as f:
         # Write the first element of final output as the expected result
         # Adjust this based on your actual design output
-        f.write(float_to_hex(final_output.flatten()[0]) + "\n")
+        f.write((first_hex + "\n").encode())
     print(f"   ✓ {output_file} (1 element)")
 
     # Write intermediate results for debugging
     debug_file = os.path.join(output_dir, "intermediate_values.txt")
-    with open(debug_file, "w") as f:
-        f.write("=" * 60 + "\n")
-        f.write("INTERMEDIATE VALUES (for debugging)\n")
-        f.write("=" * 60 + "\n\n")
-
-        f.write(f"Input Matrix A (first 3×3):\n")
-        f.write(f"{A[:3, :3]}\n\n")
-
-        f.write(f"Input Matrix B (first 3×3):\n")
-        f.write(f"{B[:3, :3]}\n\n")
-
-        f.write(f"After MatMul C = A×B (first 3×3):\n")
-        f.write(f"{C[:3, :3]}\n\n")
-
-        f.write(f"After Activation ({activation_type}) (first 3×3):\n")
-        f.write(f"{activated[:3, :3]}\n\n")
-
-        f.write(f"MaxPool Input ({in_rows}×{in_cols}):\n")
-        f.write(f"{maxpool_input}\n\n")
-
-        f.write(f"After MaxPool:\n")
-        f.write(f"{pooled}\n\n")
-
-        f.write(f"After Dropout (inference mode):\n")
-        f.write(f"{final_output}\n\n")
-
-        f.write(f"Expected Final Output (first element): {final_output.flatten()[0]}\n")
-        f.write(
-            f"Expected Final Output (hex): {float_to_hex(final_output.flatten()[0])}\n"
-        )
+    debug_lines = [
+        "=" * 60 + "\n",
+        "INTERMEDIATE VALUES (for debugging)\n",
+        "=" * 60 + "\n\n",
+        f"Input Matrix A (first 3×3):\n",
+        f"{A[:3, :3]}\n\n",
+        f"Input Matrix B (first 3×3):\n",
+        f"{B[:3, :3]}\n\n",
+        f"After MatMul C = A×B (first 3×3):\n",
+        f"{C[:3, :3]}\n\n",
+        f"After Activation ({activation_type}) (first 3×3):\n",
+        f"{activated[:3, :3]}\n\n",
+        f"MaxPool Input ({in_rows}×{in_cols}):\n",
+        f"{maxpool_input}\n\n",
+        f"After MaxPool:\n",
+        f"{pooled}\n\n",
+        f"After Dropout (inference mode):\n",
+        f"{final_output}\n\n",
+        f"Expected Final Output (first element): {first_val}\n",
+        f"Expected Final Output (hex): {first_hex}\n",
+    ]
+    Path(debug_file).write_text("".join(debug_lines))
 
     print(f"   ✓ {debug_file} (intermediate values for verification)")
 
@@ -246,9 +385,7 @@ def generate_pipeline_test_vectors(
     print(f"  A[0,0] = {A[0,0]:.6f} (hex: {float_to_hex(A[0,0])})")
     print(f"  B[0,0] = {B[0,0]:.6f} (hex: {float_to_hex(B[0,0])})")
     print(f"  C[0,0] = {C[0,0]:.6f} (hex: {float_to_hex(C[0,0])})")
-    print(
-        f"  Final[0] = {final_output.flatten()[0]:.6f} (hex: {float_to_hex(final_output.flatten()[0])})"
-    )
+    print(f"  Final[0] = {first_val:.6f} (hex: {first_hex})")
     print("=" * 60)
 
     return {